@@ -1,10 +1,24 @@
 import asyncio
+import time
+from collections import defaultdict
 from dataclasses import dataclass
 from typing import Any
 
 import httpx
+import orjson
 from bolt11 import decode as decode_bolt11
 
+NodeMetadata = tuple[str | None, int | None, int | None]
+
+# Node alias/capacity barely move hour to hour, so 1ml.com is asked at most hourly
+NODE_CACHE_TTL = 3600.0
+
+# Unreachable mints should fail on connect, not hold a slot for the full read timeout
+QUOTE_TIMEOUT = httpx.Timeout(10.0, connect=2.0)
+
+_node_cache: dict[str, tuple[float, NodeMetadata]] = {}
+_node_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
 
 @dataclass
 class LightningProbeResult:
@@ -18,24 +32,22 @@ class LightningProbeResult:
 async def fetch_invoice_request(
     mint_url: str, client: httpx.AsyncClient
 ) -> tuple[str | None, dict[str, Any] | None]:
+    # One request per mint: https unless the mint advertises plain http. Falling
+    # back across schemes only doubled the time spent on unreachable mints.
     u = mint_url.rstrip("/")
-    if u.startswith("https://"):
-        u = u[8:]
-    elif u.startswith("http://"):
-        u = u[7:]
-
-    targets = [f"https://{u}", f"http://{u}"]
-
-    for base in targets:
-        endpoint = f"{base}/v1/mint/quote/bolt11"
-        try:
-            r = await client.post(endpoint, json={"unit": "sat", "amount": 100})
-            if r.status_code == 200:
-                data = r.json()
-                invoice = data.get("request") or data.get("bolt11")
-                return (invoice if isinstance(invoice, str) else None), data
-        except Exception:
-            pass
+    base = u if u.startswith("http://") else f"https://{u.removeprefix('https://')}"
+    try:
+        r = await client.post(
+            f"{base}/v1/mint/quote/bolt11",
+            json={"unit": "sat", "amount": 100},
+            timeout=QUOTE_TIMEOUT,
+        )
+        if r.status_code == 200:
+            data = orjson.loads(r.content)
+            invoice = data.get("request") or data.get("bolt11")
+            return (invoice if isinstance(invoice, str) else None), data
+    except Exception:
+        pass
 
     return None, None
 
@@ -49,14 +61,24 @@ def decode_invoice_pubkey(invoice: str) -> str | None:
         return None
 
 
-async def fetch_node_metadata(
-    pubkey: str, client: httpx.AsyncClient
-) -> tuple[str | None, int | None, int | None]:
+async def fetch_node_metadata(pubkey: str, client: httpx.AsyncClient) -> NodeMetadata:
+    # Mints sharing a node wait on one lookup instead of each hitting 1ml.com
+    async with _node_locks[pubkey]:
+        cached = _node_cache.get(pubkey)
+        if cached and time.monotonic() - cached[0] < NODE_CACHE_TTL:
+            return cached[1]
+        meta = await _fetch_node_metadata(pubkey, client)
+        if meta != (None, None, None):
+            _node_cache[pubkey] = (time.monotonic(), meta)
+        return meta
+
+
+async def _fetch_node_metadata(pubkey: str, client: httpx.AsyncClient) -> NodeMetadata:
     try:
         r = await client.get(f"https://1ml.com/node/{pubkey}/json")
         if r.status_code != 200:
             return None, None, None
-        data = r.json()
+        data = orjson.loads(r.content)
         alias_val = data.get("alias")
         alias: str | None = alias_val if isinstance(alias_val, str) else None
         cap_val = data.get("capacity")
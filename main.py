@@ -1,17 +1,22 @@
 import asyncio
+import html
 import time
 import contextlib
-from dataclasses import dataclass
+import hashlib
+from itertools import groupby
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from typing import Any, cast
-from decimal import Decimal, ROUND_HALF_UP
 
 import httpx
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from sqlmodel import SQLModel, Field, Session, create_engine, select
+from sqlalchemy import ColumnElement, bindparam, case, event, func, insert
+from sqlalchemy.orm import aliased
+from sqlmodel import SQLModel, Field, Index, Session, create_engine, select
 from contextlib import asynccontextmanager
 
 from nostr import stream_nostr
@@ -22,6 +27,47 @@ DB_URL = "sqlite:///./mint_status.db"
 engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
 
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn: Any, _record: Any) -> None:
+    # WAL lets /dashboard read while the loops write; NORMAL skips the per-commit
+    # fsync that is only needed to survive power loss, not a process crash
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
+# httpx drops idle connections after 5s by default, long before the next 60s
+# health tick; keep them (and their TLS sessions) across ticks instead. Every
+# mint is its own host, so the idle pool must hold one connection per mint
+HTTP_LIMITS = httpx.Limits(
+    max_keepalive_connections=256, max_connections=512, keepalive_expiry=120.0
+)
+# Nostr listings and audit stats drift slowly; both loops share one refresh
+DISCOVERY_INTERVAL = 300.0
+# Relays keep replaying listings for known mints; stop once none is new for this long
+NOSTR_NEW_URL_IDLE = 2.0
+HEALTH_CONCURRENCY = 32
+# Each lightning probe makes a quote request plus a 1ml.com lookup
+LIGHTNING_CONCURRENCY = 16
+SPARKLINE_CELLS = 50
+LATENCY_WINDOW = 500
+# Refresh SQLite's planner statistics as the check tables grow
+OPTIMIZE_INTERVAL = 3600.0
+# Open tabs share one render per window; new checks invalidate it immediately
+TBODY_TTL = 5.0
+# /v1/info only changes when a mint is reconfigured: read its body this often
+# and check liveness with HEAD in between
+INFO_TTL = 3600.0
+
+_currency_cache: dict[str, tuple[float, int]] = {}
+# Endpoints whose HEAD failed but GET succeeded; they get a streamed GET instead
+_no_head: set[str] = set()
+
+
 class Mint(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     url: str = Field(index=True)
@@ -29,8 +75,13 @@ class Mint(SQLModel, table=True):
 
 
 class HealthCheck(SQLModel, table=True):
+    # Serves both per-mint lookups and newest-first scans without a sort
+    __table_args__ = (
+        Index("ix_healthcheck_mint_id_checked_at", "mint_id", "checked_at"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    mint_id: int = Field(foreign_key="mint.id", index=True)
+    mint_id: int = Field(foreign_key="mint.id")
     status: bool
     response_ms: int | None = None
     currency_count: int | None = None
@@ -42,8 +93,12 @@ class HealthCheck(SQLModel, table=True):
 
 
 class LightningSnapshot(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_lightningsnapshot_mint_id_checked_at", "mint_id", "checked_at"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    mint_id: int = Field(foreign_key="mint.id", index=True)
+    mint_id: int = Field(foreign_key="mint.id")
     invoice: str | None = None
     payee_pubkey: str | None = Field(default=None, index=True)
     node_name: str | None = None
@@ -52,17 +107,6 @@ class LightningSnapshot(SQLModel, table=True):
     checked_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
-class MintListing(BaseModel):
-    id: str
-    pubkey: str
-    created_at: int
-    kind: int
-    tags: list[list[str]]
-    content: str
-    sig: str
-    relay: str
-
-
 def create_db() -> None:
     SQLModel.metadata.create_all(engine)
     with engine.connect() as conn:
@@ -86,17 +130,35 @@ def create_db() -> None:
         if "n_melts" not in names_hc:
             conn.exec_driver_sql("ALTER TABLE healthcheck ADD COLUMN n_melts INTEGER")
 
+        # The (mint_id, checked_at) indexes supersede the old mint_id-only ones
+        for table in ("healthcheck", "lightningsnapshot"):
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{table}_mint_id")
+            conn.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_mint_id_checked_at"
+                f" ON {table} (mint_id, checked_at)"
+            )
+    optimize_db()
+
 
-async def fetch_nostr_mints() -> list[MintListing]:
-    def _parse(event: dict[str, Any]) -> MintListing | None:
+def optimize_db() -> None:
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+
+
+async def optimize_loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
         try:
-            return MintListing.model_validate(event)
-        except Exception:
-            return None
+            await asyncio.wait_for(stop.wait(), timeout=OPTIMIZE_INTERVAL)
+        except asyncio.TimeoutError:
+            await asyncio.to_thread(optimize_db)
 
-    return [
-        mint
-        async for event in stream_nostr(
+
+async def fetch_nostr_mints() -> list[str]:
+    # stream_nostr already drops relay duplicates
+    urls: dict[str, None] = {}
+    last_new = time.monotonic()
+    async with contextlib.aclosing(
+        stream_nostr(
             [
                 "wss://relay.damus.io",
                 "wss://relay.snort.social",
@@ -107,8 +169,15 @@ async def fetch_nostr_mints() -> list[MintListing]:
             [{"kinds": [38172]}],
             stop_after_idle=1,
         )
-        if (mint := _parse(event)) is not None
-    ]
+    ) as events:
+        async for event in events:
+            url = extract_url(event)
+            if url and url not in urls:
+                urls[url] = None
+                last_new = time.monotonic()
+            elif time.monotonic() - last_new > NOSTR_NEW_URL_IDLE:
+                break
+    return list(urls)
 
 
 async def fetch_audit_mints() -> list[dict[str, Any]]:
@@ -123,7 +192,7 @@ async def fetch_audit_mints() -> list[dict[str, Any]]:
                 )
                 if r.status_code != 200:
                     break
-                data = r.json()
+                data = orjson.loads(r.content)
                 if not data:
                     break
 
@@ -140,8 +209,22 @@ async def fetch_audit_mints() -> list[dict[str, Any]]:
     return mints_data
 
 
-def extract_url(mint: MintListing) -> str | None:
-    return next((tag[1] for tag in mint.tags if len(tag) >= 2 and tag[0] == "u"), None)
+def extract_url(event: dict[str, Any]) -> str | None:
+    # Mint listings (kind 38172) carry the mint URL in a u tag
+    tags = event.get("tags")
+    if event.get("kind") != 38172 or not isinstance(tags, list):
+        return None
+    return next(
+        (
+            tag[1]
+            for tag in tags
+            if isinstance(tag, list)
+            and len(tag) >= 2
+            and tag[0] == "u"
+            and isinstance(tag[1], str)
+        ),
+        None,
+    )
 
 
 def normalize_url(url: str) -> str:
@@ -157,40 +240,44 @@ async def discover_mint_urls() -> dict[str, dict[str, Any] | None]:
     nostr_task = asyncio.create_task(fetch_nostr_mints())
     audit_task = asyncio.create_task(fetch_audit_mints())
 
-    nostr_mints, audit_data = await asyncio.gather(nostr_task, audit_task)
+    nostr_urls, audit_data = await asyncio.gather(nostr_task, audit_task)
 
-    # Map normalized URL to (original_url, extra_data)
     # We prioritize the original_url from Nostr if available, otherwise from Audit
-    normalized_map: dict[str, dict[str, Any]] = {}
+    canonical: dict[str, str] = {}  # normalized URL -> first spelling seen
+    result: dict[str, dict[str, Any] | None] = {}
 
-    # Process Nostr mints
-    for m in nostr_mints:
-        if u := extract_url(m):
-            norm = normalize_url(u)
-            if norm not in normalized_map:
-                normalized_map[norm] = {"url": u, "data": None}
+    for u in nostr_urls:
+        result.setdefault(canonical.setdefault(normalize_url(u), u), None)
 
-    # Process Audit mints
+    # Audit entries attach their stats to a known mint or add a new one
     for m in audit_data:
-        if isinstance(m, dict) and "url" in m:
-            u = m["url"]
-            if isinstance(u, str):
-                norm = normalize_url(u)
-                if norm in normalized_map:
-                    # Update existing entry with stats
-                    normalized_map[norm]["data"] = m
-                else:
-                    # New entry from Audit
-                    normalized_map[norm] = {"url": u, "data": m}
-
-    # Reconstruct result
-    result: dict[str, dict[str, Any] | None] = {}
-    for entry in normalized_map.values():
-        result[entry["url"]] = entry["data"]
+        u = m.get("url") if isinstance(m, dict) else None
+        if isinstance(u, str):
+            result[canonical.setdefault(normalize_url(u), u)] = m
 
     return result
 
 
+@dataclass
+class MintDirectory:
+    mints: dict[str, dict[str, Any] | None] = field(default_factory=dict)
+    # Set once the first non-empty discovery lands
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+async def discovery_loop(stop: asyncio.Event, directory: MintDirectory) -> None:
+    while not stop.is_set():
+        found = await discover_mint_urls()
+        # Relays and the audit API all failing yields nothing; keep the last list
+        if found:
+            directory.mints = found
+            directory.ready.set()
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=DISCOVERY_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
 async def http_health(
     url: str, client: httpx.AsyncClient
 ) -> tuple[str, bool, int | None, int | None]:
@@ -205,26 +292,25 @@ async def http_health(
     targets = [f"https://{u}", f"http://{u}"]
 
     for target in targets:
+        endpoint = f"{target}/v1/info"
         try:
-            r = await client.get(f"{target}/v1/info")
+            cached = _currency_cache.get(url)
+            if cached and time.monotonic() - cached[0] < INFO_TTL:
+                if await probe_status(endpoint, client) == 200:
+                    elapsed_ms = int((time.perf_counter() - start) * 1000)
+                    return url, True, elapsed_ms, cached[1]
+                continue
+            r = await client.get(endpoint)
             if r.status_code == 200:
                 elapsed_ms = int((time.perf_counter() - start) * 1000)
                 currencies = 0
                 try:
-                    data = r.json()
-                    nuts = data.get("nuts", {})
+                    nuts = orjson.loads(r.content).get("nuts", {})
                     if "4" in nuts and "methods" in nuts["4"]:
-                        methods = nuts["4"]["methods"]
-                        # count unique units
-                        units = set()
-                        for m in methods:
-                            if isinstance(m, dict):
-                                units.add(m.get("unit"))
-                            elif isinstance(m, (list, tuple)) and len(m) >= 2:
-                                units.add(m[1])
-                        currencies = len({x for x in units if x})
+                        currencies = count_currencies(nuts["4"]["methods"])
                 except Exception:
                     pass
+                _currency_cache[url] = (time.monotonic(), currencies)
                 return url, True, elapsed_ms, currencies
         except Exception:
             pass
@@ -232,114 +318,225 @@ async def http_health(
     return url, False, None, None
 
 
+def count_currencies(methods: list[Any]) -> int:
+    # NUT-04 methods are dicts with a "unit", or [method, unit] pairs
+    units = set()
+    for m in methods:
+        if isinstance(m, dict):
+            u = m.get("unit")
+        elif isinstance(m, (list, tuple)) and len(m) >= 2:
+            u = m[1]
+        else:
+            continue
+        if u:
+            units.add(u)
+    return len(units)
+
+
+async def probe_status(endpoint: str, client: httpx.AsyncClient) -> int:
+    if endpoint not in _no_head:
+        r = await client.head(endpoint)
+        if r.is_success:
+            return r.status_code
+    # Mints reject HEAD with all sorts of codes (405, 404, 403, ...) while GET
+    # works, so a failed HEAD is only settled by the GET. Leaving the block
+    # without reading closes the stream, so the body is dropped
+    async with client.stream("GET", endpoint) as r:
+        if r.is_success:
+            _no_head.add(endpoint)
+        return r.status_code
+
+
+async def gather_bounded[T](
+    limit: int,
+    probe: Callable[[str, httpx.AsyncClient], Awaitable[T]],
+    urls: list[str],
+    client: httpx.AsyncClient,
+) -> list[T]:
+    sem = asyncio.Semaphore(limit)
+
+    async def _bounded(url: str) -> T:
+        async with sem:
+            return await probe(url, client)
+
+    return await asyncio.gather(*[_bounded(u) for u in urls])
+
+
+def mint_ids(session: Session, urls: list[str]) -> dict[str, int]:
+    return {
+        url: cast(int, mint_id)
+        for url, mint_id in session.exec(
+            select(Mint.url, Mint.id).where(cast(Any, Mint.url).in_(urls))
+        )
+    }
+
+
 def ensure_mints(session: Session, urls: list[str]) -> dict[str, int]:
-    existing = session.exec(select(Mint).where(cast(Any, Mint.url).in_(urls))).all()
-    known = {m.url: m.id for m in existing if m.id is not None}
-    for url in urls:
-        if url not in known:
-            m = Mint(url=url)
-            session.add(m)
-            session.commit()
-            session.refresh(m)
-            known[url] = int(m.id)  # type: ignore[arg-type]
+    known = mint_ids(session, urls)
+    missing = [u for u in dict.fromkeys(urls) if u not in known]
+    if missing:
+        # Core inserts skip default_factory, so created_at is filled in here
+        now = datetime.now(timezone.utc)
+        session.exec(
+            insert(Mint), params=[{"url": u, "created_at": now} for u in missing]
+        )
+        known.update(mint_ids(session, missing))
+        session.commit()
     return known
 
 
-async def monitor_loop(stop: asyncio.Event) -> None:
+async def monitor_loop(
+    stop: asyncio.Event, client: httpx.AsyncClient, directory: MintDirectory
+) -> None:
+    await directory.ready.wait()
     while not stop.is_set():
-        url_data_map = await discover_mint_urls()
+        url_data_map = directory.mints
         urls = sorted(list(url_data_map.keys()))
 
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            results = await asyncio.gather(*[http_health(u, client) for u in urls])
+        results = await gather_bounded(HEALTH_CONCURRENCY, http_health, urls, client)
 
         with Session(engine) as s:
             url_to_id = ensure_mints(s, [u for u, _, _, _ in results])
+            checked_at = datetime.now(timezone.utc)
+            rows: list[dict[str, Any]] = []
             for url, ok, ms, curs in results:
                 # Extract stats from audit data if available
                 extra = url_data_map.get(url)
-                n_errors = extra.get("n_errors") if extra else None
-                n_mints = extra.get("n_mints") if extra else None
-                n_melts = extra.get("n_melts") if extra else None
-
-                s.add(
-                    HealthCheck(
-                        mint_id=url_to_id[url],
-                        status=ok,
-                        response_ms=ms,
-                        currency_count=curs,
-                        n_errors=n_errors,
-                        n_mints=n_mints,
-                        n_melts=n_melts,
-                    )
+                rows.append(
+                    {
+                        "mint_id": url_to_id[url],
+                        "status": ok,
+                        "response_ms": ms,
+                        "currency_count": curs,
+                        "n_errors": extra.get("n_errors") if extra else None,
+                        "n_mints": extra.get("n_mints") if extra else None,
+                        "n_melts": extra.get("n_melts") if extra else None,
+                        "checked_at": checked_at,
+                    }
                 )
+            # One executemany instead of building and flushing an ORM object per row
+            if rows:
+                s.exec(insert(HealthCheck), params=rows)
             s.commit()
+        invalidate_tbody()
         try:
             await asyncio.wait_for(stop.wait(), timeout=60.0)
         except asyncio.TimeoutError:
             pass
 
 
-async def lightning_loop(stop: asyncio.Event) -> None:
+async def lightning_loop(
+    stop: asyncio.Event, client: httpx.AsyncClient, directory: MintDirectory
+) -> None:
+    await directory.ready.wait()
     while not stop.is_set():
-        url_data_map = await discover_mint_urls()
+        url_data_map = directory.mints
         urls = sorted(list(url_data_map.keys()))
-        active_urls: list[str] = []
         with Session(engine) as s:
             url_to_id = ensure_mints(s, urls)
-            for url, mint_id in url_to_id.items():
-                last = s.exec(
-                    select(HealthCheck)
-                    .where(HealthCheck.mint_id == mint_id)
-                    .order_by(cast(Any, HealthCheck.checked_at).desc())
-                    .limit(1)
-                ).first()
-                if last and last.status:
-                    active_urls.append(url)
+            # Mints whose latest health check passed, in one query
+            up_ids = set(
+                s.exec(
+                    select(HealthCheck.mint_id)
+                    .select_from(Mint)
+                    .join(HealthCheck, newest_per_mint(HealthCheck, 1))
+                    .where(cast(Any, HealthCheck.status))
+                )
+            )
+        active_urls = [url for url, mint_id in url_to_id.items() if mint_id in up_ids]
         if not active_urls:
             try:
                 await asyncio.wait_for(stop.wait(), timeout=15 * 60.0)
             except asyncio.TimeoutError:
                 pass
             continue
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            probes = await asyncio.gather(
-                *[probe_lightning(u, client) for u in active_urls]
-            )
+        probes = await gather_bounded(
+            LIGHTNING_CONCURRENCY, probe_lightning, active_urls, client
+        )
         with Session(engine) as s:
-            url_to_id = ensure_mints(s, active_urls)
-            for url, res in zip(active_urls, probes):
-                s.add(
-                    LightningSnapshot(
-                        mint_id=url_to_id[url],
-                        invoice=res.invoice,
-                        payee_pubkey=res.payee_pubkey,
-                        node_name=res.node_name,
-                        node_capacity_sats=res.node_capacity_sats,
-                        node_channel_count=res.node_channel_count,
+            # Node data rarely moves between probes; only record a snapshot when
+            # it differs from the mint's latest one
+            latest = {
+                mint_id: node
+                for mint_id, *node in s.exec(
+                    select(
+                        *cast(
+                            Any,
+                            (
+                                LightningSnapshot.mint_id,
+                                LightningSnapshot.payee_pubkey,
+                                LightningSnapshot.node_name,
+                                LightningSnapshot.node_capacity_sats,
+                                LightningSnapshot.node_channel_count,
+                            ),
+                        )
                     )
+                    .select_from(Mint)
+                    .join(LightningSnapshot, newest_per_mint(LightningSnapshot, 1))
+                )
+            }
+            checked_at = datetime.now(timezone.utc)
+            rows: list[dict[str, Any]] = []
+            for url, res in zip(active_urls, probes):
+                node = [
+                    res.payee_pubkey,
+                    res.node_name,
+                    res.node_capacity_sats,
+                    res.node_channel_count,
+                ]
+                if latest.get(url_to_id[url]) == node:
+                    continue
+                rows.append(
+                    {
+                        "mint_id": url_to_id[url],
+                        "invoice": res.invoice,
+                        "payee_pubkey": res.payee_pubkey,
+                        "node_name": res.node_name,
+                        "node_capacity_sats": res.node_capacity_sats,
+                        "node_channel_count": res.node_channel_count,
+                        "checked_at": checked_at,
+                    }
                 )
+            if rows:
+                s.exec(insert(LightningSnapshot), params=rows)
             s.commit()
+        invalidate_tbody()
         try:
             await asyncio.wait_for(stop.wait(), timeout=15 * 60.0)
         except asyncio.TimeoutError:
             pass
 
 
-def render_sparkline(statuses: list[bool], total: int = 50) -> str:
-    cells = statuses[:total]
-    cells = cells + [False] * (total - len(cells))
-    colors = ["#16a34a" if s else "#ef4444" for s in cells]
-    return "".join(f'<span class="cell" style="background:{c}"></span>' for c in colors)
+_CELL_UP = '<span class="cell" style="background:#16a34a"></span>'
+_CELL_DOWN = '<span class="cell" style="background:#ef4444"></span>'
+
+
+# HTML for every 10-cell run of statuses, indexed by the run's bits (LSB first)
+_SPARK_RUN = 10
+_SPARK_RUNS = [
+    "".join([_CELL_UP if mask >> i & 1 else _CELL_DOWN for i in range(_SPARK_RUN)])
+    for mask in range(1 << _SPARK_RUN)
+]
+
+
+def render_sparkline(statuses: list[bool], total: int = SPARKLINE_CELLS) -> str:
+    # Missing history renders as down cells, i.e. the unset high bits
+    mask = sum(1 << i for i, up in enumerate(statuses[:total]) if up)
+    runs = total // _SPARK_RUN
+    low = (1 << _SPARK_RUN) - 1
+    parts = [_SPARK_RUNS[mask >> (k * _SPARK_RUN) & low] for k in range(runs)]
+    parts += [
+        _CELL_UP if mask >> i & 1 else _CELL_DOWN
+        for i in range(runs * _SPARK_RUN, total)
+    ]
+    return "".join(parts)
 
 
 @dataclass
 class MintRow:
     url: str
     uptime_24h: str
-    last_seen: str
     checks_html: str
-    ln_pubkey: str | None
     ln_name: str | None
     ln_capacity: str | None
     ln_channels: int | None
@@ -347,7 +544,6 @@ class MintRow:
     currencies: int | None
     is_up: bool
     uptime_class: str
-    latency_class: str
     # Raw values for sorting
     raw_uptime: float
     raw_capacity: int
@@ -356,29 +552,106 @@ class MintRow:
     n_errors: int
     n_mints: int
     n_melts: int
+    # Pre-rendered cells, built once per row in compute_rows
+    display_url: str
+    node_cell: str
+    capacity_cell: str
+    latency_cell: str
+
+
+def format_btc(sats: int) -> str:
+    # Fewer decimals for bigger nodes, rounded half-up on exact integers.
+    # Capacities are never negative: 1ml.com values must pass isdigit()
+    decimals = 1 if sats >= 1_000_000_000 else 2 if sats >= 100_000_000 else 4
+    step = 10 ** (8 - decimals)
+    whole, frac = divmod((sats + step // 2) // step, 10**decimals)
+    return f"{whole:,}.{frac:0{decimals}d} BTC"
+
+
+def newest_per_mint(
+    model: type[HealthCheck] | type[LightningSnapshot], limit: int
+) -> ColumnElement[bool]:
+    # Join condition picking the `limit` newest rows of `model` for each mint.
+    # Driven from the mint table, every lookup is a bounded index range scan
+    # instead of a window over the table's whole history.
+    newest = aliased(model)
+    return cast(Any, model.id).in_(
+        select(newest.id)
+        .where(newest.mint_id == Mint.id)
+        .order_by(cast(Any, newest.checked_at).desc())
+        .limit(limit)
+        .correlate(Mint)
+    )
+
+
+# Dashboard queries are built once; only the 24h cutoff is bound per render
+_MINTS_STMT = select(Mint).order_by(Mint.url)
+# sqlmodel's select() is only typed for up to four columns
+_RECENT_STMT = (
+    select(
+        *cast(
+            Any,
+            (
+                HealthCheck.mint_id,
+                HealthCheck.status,
+                HealthCheck.currency_count,
+                HealthCheck.n_errors,
+                HealthCheck.n_mints,
+                HealthCheck.n_melts,
+            ),
+        )
+    )
+    .select_from(Mint)
+    .join(HealthCheck, newest_per_mint(HealthCheck, SPARKLINE_CELLS))
+    .order_by(HealthCheck.mint_id, cast(Any, HealthCheck.checked_at).desc())
+)
+_LATENCY_STMT = (
+    select(HealthCheck.mint_id, func.avg(HealthCheck.response_ms))
+    .select_from(Mint)
+    .join(HealthCheck, newest_per_mint(HealthCheck, LATENCY_WINDOW))
+    .group_by(cast(Any, HealthCheck.mint_id))
+)
+# Driven from the mint table so each mint is an index range seek on
+# (mint_id, checked_at) over the last 24h, not a scan of all history
+_UPTIME_STMT = (
+    select(
+        cast(Any, Mint.id),
+        func.sum(case((cast(Any, HealthCheck.status), 1), else_=0)),
+        func.count(),
+    )
+    .select_from(Mint)
+    .join(HealthCheck, cast(Any, HealthCheck.mint_id) == Mint.id)
+    .where(HealthCheck.checked_at >= bindparam("since"))
+    .group_by(cast(Any, Mint.id))
+)
+_SNAPSHOT_STMT = (
+    select(LightningSnapshot)
+    .select_from(Mint)
+    .join(LightningSnapshot, newest_per_mint(LightningSnapshot, 1))
+)
 
 
 def compute_rows() -> list[MintRow]:
-    now = datetime.now(timezone.utc)
-    since_24h = now - timedelta(hours=24)
+    since_24h = datetime.now(timezone.utc) - timedelta(hours=24)
     rows: list[MintRow] = []
     with Session(engine) as s:
-        mints = s.exec(select(Mint).order_by(Mint.url)).all()
-        for m in mints:
-            recent = s.exec(
-                select(HealthCheck)
-                .where(HealthCheck.mint_id == m.id)
-                .order_by(cast(Any, HealthCheck.checked_at).desc())
-                .limit(500)
-            ).all()
-            last_time = recent[0].checked_at if recent else None
-            if last_time and last_time.tzinfo is None:
-                last_time = last_time.replace(tzinfo=timezone.utc)
-            last_seen = (
-                f"{max(0, int((now - last_time).total_seconds()))}s"
-                if last_time
-                else "-"
+        mints = s.exec(_MINTS_STMT).all()
+        recent_by_mint = {
+            mint_id: list(checks)
+            for mint_id, checks in groupby(
+                s.exec(_RECENT_STMT), key=lambda hc: hc.mint_id
             )
+        }
+        latency_by_mint: dict[int, float | None] = {
+            mint_id: avg for mint_id, avg in s.exec(_LATENCY_STMT)
+        }
+        uptime_by_mint: dict[int, tuple[int, int]] = {
+            mint_id: (up, total)
+            for mint_id, up, total in s.exec(_UPTIME_STMT, params={"since": since_24h})
+        }
+        snapshot_by_mint = {lns.mint_id: lns for lns in s.exec(_SNAPSHOT_STMT)}
+        for m in mints:
+            recent = recent_by_mint.get(cast(int, m.id), [])
             last50 = [hc.status for hc in recent]
             is_up = bool(recent and recent[0].status)
             last_currencies = (
@@ -397,38 +670,16 @@ def compute_rows() -> list[MintRow]:
                 recent[0].n_melts if recent and recent[0].n_melts is not None else 0
             )
 
-            latencies = [hc.response_ms for hc in recent if hc.response_ms is not None]
-            avg_latency = int(sum(latencies) / len(latencies)) if latencies else None
+            latency = latency_by_mint.get(cast(int, m.id))
+            avg_latency = int(latency) if latency is not None else None
 
-            lns = s.exec(
-                select(LightningSnapshot)
-                .where(LightningSnapshot.mint_id == m.id)
-                .order_by(cast(Any, LightningSnapshot.checked_at).desc())
-                .limit(1)
-            ).first()
+            lns = snapshot_by_mint.get(cast(int, m.id))
             pubkey = lns.payee_pubkey if lns else None
             node_name = lns.node_name if lns else None
             cap = lns.node_capacity_sats if lns else None
             channels = lns.node_channel_count if lns else None
-            cap_str = None
-            if cap is not None:
-                btc = Decimal(cap) / Decimal(100_000_000)
-                if btc >= Decimal(10):
-                    decimals, q = 1, Decimal("0.1")
-                elif btc >= Decimal(1):
-                    decimals, q = 2, Decimal("0.01")
-                else:
-                    decimals, q = 4, Decimal("0.0001")
-                value = btc.quantize(q, rounding=ROUND_HALF_UP)
-                cap_str = f"{value:,.{decimals}f} BTC"
-            since = s.exec(
-                select(HealthCheck).where(
-                    HealthCheck.mint_id == m.id,
-                    HealthCheck.checked_at >= since_24h,
-                )
-            ).all()
-            up = sum(1 for hc in since if hc.status)
-            total = len(since)
+            cap_str = format_btc(cap) if cap is not None else None
+            up, total = uptime_by_mint.get(cast(int, m.id), (0, 0))
             uptime_ratio = (up / total) if total else -1.0
             uptime_class = (
                 "none"
@@ -449,117 +700,171 @@ def compute_rows() -> list[MintRow]:
                 else:
                     latency_class = "slow"
 
+            # URLs and aliases come from nostr, the audit API and 1ml.com;
+            # escape them once here so rendering can interpolate them as-is
+            url = html.escape(m.url)
+            name = html.escape(node_name) if node_name else node_name
+            if name and pubkey:
+                node_cell = (
+                    f"<a class='link' href='https://1ml.com/node/{pubkey}'"
+                    f" target='_blank' rel='noopener'>{name}</a>"
+                )
+            else:
+                node_cell = name or "-"
+
             row = MintRow(
-                url=m.url,
+                url=url,
                 uptime_24h=(f"{(uptime_ratio*100):.0f}%" if total else "-"),
-                last_seen=last_seen,
                 checks_html=render_sparkline(last50),
-                ln_pubkey=pubkey,
-                ln_name=node_name,
+                ln_name=name,
                 ln_capacity=cap_str,
                 ln_channels=channels,
                 avg_latency_ms=avg_latency,
                 currencies=last_currencies,
                 is_up=is_up,
                 uptime_class=uptime_class,
-                latency_class=latency_class,
                 raw_uptime=uptime_ratio,
                 raw_capacity=cap if cap is not None else 0,
                 raw_channels=channels if channels is not None else 0,
                 n_errors=n_errors,
                 n_mints=n_mints,
                 n_melts=n_melts,
+                display_url=url.replace("https://", "").replace("http://", ""),
+                node_cell=node_cell,
+                capacity_cell=(
+                    f"<span class='badge cap'>{cap_str}</span>" if cap_str else "-"
+                ),
+                latency_cell=(
+                    f"<span class='badge latency {latency_class}'>"
+                    f"{avg_latency} ms</span>"
+                    if avg_latency is not None
+                    else "-"
+                ),
             )
             rows.append(row)
 
     return rows
 
 
+_ROW_TEMPLATE = (
+    "<tr class='%(classes)s' "
+    'data-url="%(url)s" '
+    'data-name="%(name)s" '
+    'data-up="%(up)s" '
+    'data-uptime="%(raw_uptime)s" '
+    'data-capacity="%(raw_capacity)s" '
+    'data-channels="%(raw_channels)s" '
+    'data-currencies="%(currencies_sort)s" '
+    'data-errors="%(n_errors)s" '
+    'data-mints="%(n_mints)s" '
+    'data-melts="%(n_melts)s" '
+    'data-latency="%(latency_sort)s" >'
+    '<td class=mint><span class="status-dot %(state)s" title="%(state_title)s">'
+    '</span><a class=link href="%(url)s" target="_blank" rel="noopener">'
+    "%(display_url)s</a></td>"
+    '<td><span class="badge uptime %(uptime_class)s" title="Uptime last 24h">'
+    "%(uptime_24h)s</span></td>"
+    "<td><div class=spark>%(checks_html)s</div></td>"
+    "<td class=mono>%(node_cell)s</td>"
+    "<td>%(channels_cell)s</td>"
+    "<td>%(capacity_cell)s</td>"
+    "<td class=currencies>%(currencies_cell)s</td>"
+    "<td>%(n_mints)s</td>"
+    "<td>%(n_melts)s</td>"
+    "<td>%(n_errors)s</td>"
+    "<td>%(latency_cell)s</td>"
+    "</tr>"
+)
+
+
+def row_html(r: MintRow) -> str:
+    # 'no-cap' dims rows whose lightning capacity is unknown
+    state = "up" if r.is_up else "down"
+    return _ROW_TEMPLATE % {
+        "classes": state if r.ln_capacity is not None else f"{state} no-cap",
+        "url": r.url,
+        "name": r.ln_name or "",
+        "up": 1 if r.is_up else 0,
+        "raw_uptime": r.raw_uptime,
+        "raw_capacity": r.raw_capacity,
+        "raw_channels": r.raw_channels,
+        "currencies_sort": r.currencies if r.currencies is not None else 0,
+        "n_errors": r.n_errors,
+        "n_mints": r.n_mints,
+        "n_melts": r.n_melts,
+        "latency_sort": r.avg_latency_ms if r.avg_latency_ms is not None else 99999,
+        "state": state,
+        "state_title": "Up" if r.is_up else "Down",
+        "display_url": r.display_url,
+        "uptime_class": r.uptime_class,
+        "uptime_24h": r.uptime_24h,
+        "checks_html": r.checks_html,
+        "node_cell": r.node_cell,
+        "channels_cell": r.ln_channels if r.ln_channels is not None else "-",
+        "capacity_cell": r.capacity_cell,
+        "currencies_cell": r.currencies if r.currencies is not None else "-",
+        "latency_cell": r.latency_cell,
+    }
+
+
 def render_tbody() -> str:
     rows = compute_rows()
-
     # Just render all rows. Frontend handles sorting and grouping.
-    def row_html(r: MintRow) -> str:
-        # Determine base classes (up/down)
-        # Note: 'no-cap' class was used for styling previously,
-        # but since we want to unify, we can treat them similarly
-        # or still add the class if we want visual distinction.
-        # Let's keep 'no-cap' if capacity is missing for visual consistency.
-        extra_class = "no-cap" if r.ln_capacity is None else ""
-        classes = (
-            f"{'up' if r.is_up else 'down'}{(' ' + extra_class) if extra_class else ''}"
-        )
-        node_cell = (
-            (
-                f"<a class='link' href='https://1ml.com/node/{r.ln_pubkey}' target='_blank' rel='noopener'>{r.ln_name}</a>"
-                if r.ln_pubkey
-                else r.ln_name
-            )
-            if r.ln_name
-            else "-"
-        )
-        channels_cell = f"{r.ln_channels}" if r.ln_channels is not None else "-"
-        currencies_cell = f"{r.currencies}" if r.currencies is not None else "-"
-
-        # Data attributes for JS sorting
-        data_attrs = (
-            f'data-url="{r.url}" '
-            f'data-name="{r.ln_name or ""}" '
-            f'data-up="{1 if r.is_up else 0}" '
-            f'data-uptime="{r.raw_uptime}" '
-            f'data-capacity="{r.raw_capacity}" '
-            f'data-channels="{r.raw_channels}" '
-            f'data-currencies="{r.currencies if r.currencies is not None else 0}" '
-            f'data-errors="{r.n_errors}" '
-            f'data-mints="{r.n_mints}" '
-            f'data-melts="{r.n_melts}" '
-            f'data-latency="{r.avg_latency_ms if r.avg_latency_ms is not None else 99999}" '
-        )
-
-        return (
-            f"<tr class='{classes}' {data_attrs}>"
-            f"<td class=mint><span class=\"status-dot {'up' if r.is_up else 'down'}\" title=\"{'Up' if r.is_up else 'Down'}\"></span><a class=link href=\"{r.url}\" target=\"_blank\" rel=\"noopener\">{r.url.replace('https://','').replace('http://','')}</a></td>"
-            f"<td><span class=\"badge uptime {r.uptime_class}\" title=\"Uptime last 24h\">{r.uptime_24h}</span></td>"
-            f"<td><div class=spark>{r.checks_html}</div></td>"
-            f"<td class=mono>{node_cell}</td>"
-            f"<td>{channels_cell}</td>"
-            f"<td>{(f'<span class=\'badge cap\'>{r.ln_capacity}</span>') if r.ln_capacity else '-'}</td>"
-            f"<td class=currencies>{currencies_cell}</td>"
-            f"<td>{r.n_mints}</td>"
-            f"<td>{r.n_melts}</td>"
-            f"<td>{r.n_errors}</td>"
-            f"<td>{(f'<span class=\'badge latency {r.latency_class}\'>{r.avg_latency_ms} ms</span>') if r.avg_latency_ms is not None else '-'}</td>"
-            f"</tr>"
-        )
-
-    body = "".join(row_html(r) for r in rows)
+    body = "".join([row_html(r) for r in rows])
     return f"<tbody id=dashboard>{body}</tbody>"
 
 
-def render_table() -> str:
-    tbody = render_tbody()
-    return (
-        "<table class=card id=mint-table>"
-        "<thead><tr>"
-        "<th class='sortable' data-key='url'>Mint</th>"
-        "<th class='sortable' data-key='uptime'>Uptime (24h)</th>"
-        "<th>Last hour</th>"
-        "<th class='sortable' data-key='ln_name'>LN Node</th>"
-        "<th class='sortable' data-key='channels'>Channels</th>"
-        "<th class='sortable' data-key='capacity'>LN Capacity (BTC)</th>"
-        "<th class='sortable' data-key='currencies'>Currencies</th>"
-        "<th class='sortable' data-key='mints'>Mints</th>"
-        "<th class='sortable' data-key='melts'>Melts</th>"
-        "<th class='sortable' data-key='errors'>Errors</th>"
-        "<th class='sortable' data-key='latency'>Latency</th>"
-        "</tr></thead>"
-        f"{tbody}"
-        "</table>"
-    )
-
-
-def render_index() -> str:
-    styles = """
+# Stored encoded, so each cache hit hands Starlette the body bytes as-is
+_tbody_cache: tuple[float, bytes, str] | None = None
+_tbody_lock = asyncio.Lock()
+# Bumped on every invalidation so a render that raced a commit isn't kept
+_tbody_generation = 0
+
+
+async def cached_tbody() -> tuple[bytes, str]:
+    global _tbody_cache
+    if _tbody_cache and time.monotonic() - _tbody_cache[0] < TBODY_TTL:
+        return _tbody_cache[1], _tbody_cache[2]
+    async with _tbody_lock:
+        # Another request may have rebuilt it while we waited for the lock
+        if _tbody_cache is None or time.monotonic() - _tbody_cache[0] >= TBODY_TTL:
+            generation = _tbody_generation
+            # compute_rows does blocking SQLite I/O; keep it off the event loop
+            tbody = (await asyncio.to_thread(render_tbody)).encode()
+            digest = hashlib.blake2b(tbody, digest_size=8).hexdigest()
+            # If a loop committed mid-render, serve this once but store it expired
+            built_at = (
+                time.monotonic() if generation == _tbody_generation else float("-inf")
+            )
+            _tbody_cache = (built_at, tbody, f'"{digest}"')
+        return _tbody_cache[1], _tbody_cache[2]
+
+
+def invalidate_tbody() -> None:
+    global _tbody_cache, _tbody_generation
+    _tbody_generation += 1
+    _tbody_cache = None
+
+
+_TABLE_HEAD = (
+    "<table class=card id=mint-table>"
+    "<thead><tr>"
+    "<th class='sortable' data-key='url'>Mint</th>"
+    "<th class='sortable' data-key='uptime'>Uptime (24h)</th>"
+    "<th>Last hour</th>"
+    "<th class='sortable' data-key='ln_name'>LN Node</th>"
+    "<th class='sortable' data-key='channels'>Channels</th>"
+    "<th class='sortable' data-key='capacity'>LN Capacity (BTC)</th>"
+    "<th class='sortable' data-key='currencies'>Currencies</th>"
+    "<th class='sortable' data-key='mints'>Mints</th>"
+    "<th class='sortable' data-key='melts'>Melts</th>"
+    "<th class='sortable' data-key='errors'>Errors</th>"
+    "<th class='sortable' data-key='latency'>Latency</th>"
+    "</tr></thead>"
+)
+
+
+_INDEX_STYLES = """
     :root{color-scheme:dark;--bg:#0a0b0f;--surface:#101216;--surface-2:#0f1114;--border:#1f2937;--text:#e5e7eb;--muted:#9ca3af;--accent:#60a5fa;--green:#16a34a;--red:#ef4444;--amber:#f59e0b}
     *{box-sizing:border-box}
     body{margin:0;font-family:ui-sans-serif,system-ui,-apple-system,Segoe UI,Roboto,Ubuntu,Cantarell,Noto Sans,sans-serif;line-height:1.5;background:var(--bg);color:var(--text)}
@@ -615,7 +920,7 @@ def render_index() -> str:
     .val{float:right;color:var(--text)}
     """.strip()
 
-    settings_form = """
+_SETTINGS_FORM = """
     <details open>
         <summary>Ranking Configuration</summary>
         <div class="config-grid">
@@ -657,46 +962,75 @@ def render_index() -> str:
     </details>
     """
 
-    return (
-        "<!doctype html><html><head><meta charset=utf-8>"
-        '<meta name=viewport content="width=device-width, initial-scale=1">'
-        '<meta name="theme-color" content="#0a0b0f">'
-        "<title>Cashu Mint Status</title>"
-        f"<style>{styles}</style>"
-        '<script src="https://unpkg.com/htmx.org@2.0.2" integrity="sha384-7Y/OLJm7GG4l7uYf4x2nY2hVqXzjP4uYbUhg0oMiJ2z2hQ0zDgANbHgxqCwR8K8y" crossorigin="anonymous"></script>'
-        '<script src="/static/latency.js" defer></script>'
-        '<script src="/static/sorting.js" defer></script>'
-        "</head><body>"
-        "<header><h1>Cashu.Live</h1><div id=meta><span class=muted>Auto-refresh every 10s</span></div></header>"
-        "<main>"
-        '<div hx-get="/dashboard" hx-trigger="load, every 10s" hx-target="#dashboard" hx-swap="outerHTML">'
-        f"{render_table()}"
-        "</div>"
-        f"{settings_form}"
-        "</main>"
-        "</body></html>"
-    )
+_INDEX_PREFIX = (
+    "<!doctype html><html><head><meta charset=utf-8>"
+    '<meta name=viewport content="width=device-width, initial-scale=1">'
+    '<meta name="theme-color" content="#0a0b0f">'
+    "<title>Cashu Mint Status</title>"
+    "<style>" + _INDEX_STYLES + "</style>"
+    '<script src="https://unpkg.com/htmx.org@2.0.2" integrity="sha384-7Y/OLJm7GG4l7uYf4x2nY2hVqXzjP4uYbUhg0oMiJ2z2hQ0zDgANbHgxqCwR8K8y" crossorigin="anonymous"></script>'
+    '<script src="/static/latency.js" defer></script>'
+    '<script src="/static/sorting.js" defer></script>'
+    "</head><body>"
+    "<header><h1>Cashu.Live</h1><div id=meta><span class=muted>Auto-refresh every 10s</span></div></header>"
+    "<main>"
+    '<div hx-get="/dashboard" hx-trigger="load, every 10s" hx-target="#dashboard" hx-swap="outerHTML">'
+)
+_INDEX_SUFFIX = "</div>" + _SETTINGS_FORM + "</main></body></html>"
+
+# The page is fully static: htmx's load trigger fills the empty tbody from
+# /dashboard, so serving / never touches the database
+_INDEX_HTML = (
+    _INDEX_PREFIX + _TABLE_HEAD + "<tbody id=dashboard></tbody></table>" + _INDEX_SUFFIX
+).encode()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db()
-    stop_event: asyncio.Event = asyncio.Event()
-    monitor_task: asyncio.Task[Any] = asyncio.create_task(monitor_loop(stop_event))
-    lnd_task: asyncio.Task[Any] = asyncio.create_task(lightning_loop(stop_event))
-    app.state.stop_event = stop_event
-    app.state.monitor_task = monitor_task
-    app.state.lnd_task = lnd_task
-    try:
-        yield
-    finally:
-        stop_event.set()
-        monitor_task.cancel()
-        lnd_task.cancel()
-        with contextlib.suppress(Exception):
-            await monitor_task
-        with contextlib.suppress(Exception):
-            await lnd_task
+    # Long-lived clients keep TLS sessions to mints and 1ml.com warm across cycles
+    async with (
+        httpx.AsyncClient(timeout=5.0, http2=True, limits=HTTP_LIMITS) as health_client,
+        httpx.AsyncClient(timeout=15.0, http2=True, limits=HTTP_LIMITS) as ln_client,
+    ):
+        stop_event: asyncio.Event = asyncio.Event()
+        directory = MintDirectory()
+        discovery_task: asyncio.Task[Any] = asyncio.create_task(
+            discovery_loop(stop_event, directory)
+        )
+        monitor_task: asyncio.Task[Any] = asyncio.create_task(
+            monitor_loop(stop_event, health_client, directory)
+        )
+        lnd_task: asyncio.Task[Any] = asyncio.create_task(
+            lightning_loop(stop_event, ln_client, directory)
+        )
+        optimize_task: asyncio.Task[Any] = asyncio.create_task(
+            optimize_loop(stop_event)
+        )
+        app.state.stop_event = stop_event
+        app.state.health_client = health_client
+        app.state.ln_client = ln_client
+        app.state.mint_directory = directory
+        app.state.discovery_task = discovery_task
+        app.state.monitor_task = monitor_task
+        app.state.lnd_task = lnd_task
+        app.state.optimize_task = optimize_task
+        try:
+            yield
+        finally:
+            stop_event.set()
+            discovery_task.cancel()
+            monitor_task.cancel()
+            lnd_task.cancel()
+            optimize_task.cancel()
+            with contextlib.suppress(Exception):
+                await discovery_task
+            with contextlib.suppress(Exception):
+                await monitor_task
+            with contextlib.suppress(Exception):
+                await lnd_task
+            with contextlib.suppress(Exception):
+                await optimize_task
 
 
 app = FastAPI(lifespan=lifespan)
@@ -705,13 +1039,21 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
 @app.get("/", response_class=HTMLResponse)
-async def index() -> str:
-    return render_index()
+async def index() -> HTMLResponse:
+    return HTMLResponse(_INDEX_HTML)
 
 
 @app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard() -> str:
-    return render_tbody()
+async def dashboard(request: Request) -> Response:
+    tbody, etag = await cached_tbody()
+    # no-cache makes browsers revalidate each poll; unchanged tables cost a 304
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # Weak comparison (RFC 7232): proxies that gzip the body hand back W/"..."
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(tbody, headers=headers)
 
 
 if __name__ == "__main__":
@@ -1,12 +1,17 @@
 import asyncio
-import json
 import time
-from collections.abc import AsyncIterator
+from collections import deque
+from collections.abc import AsyncGenerator
 from typing import Any, cast
 
 import httpx
+import orjson
 from httpx_ws import aconnect_ws, AsyncWebSocketSession
 
+# Relays repeat an event within moments of each other, so remembering the most
+# recent ids is enough to dedup while keeping memory flat on long streams
+SEEN_EVENTS_MAX = 10_000
+
 
 async def stream_nostr(
     relays: str | list[str],
@@ -14,7 +19,7 @@ async def stream_nostr(
     timeout: float | None = None,
     since_seconds: int | None = None,
     stop_after_idle: float | None = None,
-) -> AsyncIterator[dict[str, Any]]:
+) -> AsyncGenerator[dict[str, Any], None]:
     subscription_filters = (
         [
             {**f, "since": int(time.time()) - max(0, since_seconds)}
@@ -25,9 +30,10 @@ async def stream_nostr(
     )
     relay_urls = [relays] if isinstance(relays, str) else relays
 
-    out_queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+    # None is queued once every relay worker has exited
+    out_queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
     seen_event_ids: set[str] = set()
-    seen_lock = asyncio.Lock()
+    seen_order: deque[str] = deque()
     tasks: list[asyncio.Task[None]] = []
 
     async def _relay_worker(relay_url: str) -> None:
@@ -37,12 +43,12 @@ async def stream_nostr(
                 ws = cast(AsyncWebSocketSession, ws_raw)
                 subscription_id = f"sub_{int(time.time() * 1000)}"
                 req_message = ["REQ", subscription_id, *subscription_filters]
-                await ws.send_text(json.dumps(req_message))
+                await ws.send_text(orjson.dumps(req_message).decode())
 
                 while True:
                     message = await ws.receive_text()
                     try:
-                        data = json.loads(message)
+                        data = orjson.loads(message)
                         if (
                             isinstance(data, list)
                             and len(data) >= 3
@@ -59,47 +65,50 @@ async def stream_nostr(
                             ):
                                 continue
                             event_id = event["id"]
-                            async with seen_lock:
-                                if event_id in seen_event_ids:
-                                    continue
-                                seen_event_ids.add(event_id)
+                            # No await between check and add, so workers can't race
+                            if event_id in seen_event_ids:
+                                continue
+                            if len(seen_order) >= SEEN_EVENTS_MAX:
+                                seen_event_ids.discard(seen_order.popleft())
+                            seen_order.append(event_id)
+                            seen_event_ids.add(event_id)
                             event["relay"] = relay_url
                             await out_queue.put(event)
-                    except json.JSONDecodeError:
+                    except orjson.JSONDecodeError:
                         continue
         finally:
             await client.aclose()
 
+    def _worker_done(_: asyncio.Task[None]) -> None:
+        if all(t.done() for t in tasks):
+            out_queue.put_nowait(None)
+
     try:
         for relay_url in relay_urls:
-            tasks.append(asyncio.create_task(_relay_worker(relay_url)))
+            task = asyncio.create_task(_relay_worker(relay_url))
+            task.add_done_callback(_worker_done)
+            tasks.append(task)
 
-        start_time = time.time() if timeout else None
-        last_message_time = time.time()
+        deadline = time.monotonic() + timeout if timeout else None
+        last_message_time = time.monotonic()
 
         while True:
-            if (
-                timeout is not None
-                and start_time is not None
-                and (time.time() - start_time) > timeout
-            ):
-                break
-
-            if (
-                stop_after_idle is not None
-                and (time.time() - last_message_time) > stop_after_idle
-            ):
-                break
-
-            if tasks and all(t.done() for t in tasks) and out_queue.empty():
+            # Sleep until the next event or whichever limit comes first
+            limits = [] if deadline is None else [deadline]
+            if stop_after_idle is not None:
+                limits.append(last_message_time + stop_after_idle)
+            remaining = min(limits) - time.monotonic() if limits else None
+            if remaining is not None and remaining <= 0:
                 break
 
             try:
-                event = await asyncio.wait_for(out_queue.get(), timeout=0.05)
-                last_message_time = time.time()
-                yield event
+                event = await asyncio.wait_for(out_queue.get(), timeout=remaining)
             except asyncio.TimeoutError:
-                continue
+                break
+            if event is None:
+                break
+            last_message_time = time.monotonic()
+            yield event
     finally:
         for task in tasks:
             task.cancel()